@@ -8,11 +8,82 @@ import subprocess
 import sys
 import os
 import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
 
-def run_command(command):
-    """Run a shell command and return the result."""
+PIP_CACHE_DIR = ".pip-cache"
+VENV_PATH = "venv"
+REQ_HASH_FILE = ".req-hash"
+
+SERVICE_TEMPLATE = """[Unit]
+Description=WhatsApp Automation Bot
+After=network.target
+
+[Service]
+Type=simple
+User={user}
+WorkingDirectory={cwd}
+ExecStart={python} {script} run
+Restart=always
+RestartSec=10
+Environment=DISPLAY=:0
+Environment=PYTHONPATH={cwd}
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+ACTIVATION_TEMPLATE = """#!/bin/bash
+# WhatsApp Bot Virtual Environment Activation
+# Source this file to activate the virtual environment
+
+# Activate virtual environment
+source {venv_path}/bin/activate
+
+echo "Virtual environment activated!"
+echo "Python executable: {python}"
+echo ""
+echo "You can now run:"
+echo "  python whatsapp_automation.py run"
+echo "  python whatsapp_automation.py test +1234567890"
+echo ""
+echo "Or use the launcher script:"
+echo "  ./start_bot.sh run"
+"""
+
+def requirements_hash():
+    """Return a hash of requirements.txt used to detect dependency changes."""
+    with open("requirements.txt", "rb") as f:
+        return hashlib.blake2b(f.read()).hexdigest()
+
+def requirements_up_to_date(env_path, req_hash):
+    """Check whether the environment was last installed from the same requirements.txt."""
+    try:
+        with open(os.path.join(env_path, REQ_HASH_FILE), "r") as f:
+            return f.read().strip() == req_hash
+    except OSError:
+        return False
+
+def mark_requirements_installed(env_path, req_hash):
+    """Record the requirements.txt hash the environment was installed from."""
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        with open(os.path.join(env_path, REQ_HASH_FILE), "w") as f:
+            f.write(req_hash)
+    except OSError as e:
+        print(f"Warning: Could not record installed requirements: {e}")
+
+def write_file(path, content):
+    """Write a text file atomically through a temporary file and os.replace."""
+    tmp_path = path + ".tmp"
+    Path(tmp_path).write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def run_command(argv: List[str]):
+    """Run a command given as an argv list (no shell) and return the result."""
+    try:
+        result = subprocess.run(argv, check=True, capture_output=True, text=True)
         return True, result.stdout
     except subprocess.CalledProcessError as e:
         return False, e.stderr
@@ -23,23 +94,19 @@ def install_dependencies():
     
     # Check if we're in a virtual environment
     in_venv = hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
+    env_path = sys.prefix if in_venv else VENV_PATH
+    
+    try:
+        req_hash = requirements_hash()
+    except OSError as e:
+        print(f"❌ Failed to install dependencies: cannot read requirements.txt: {e}")
+        return False
+    if requirements_up_to_date(env_path, req_hash):
+        print("✅ Dependencies already up to date, skipping installation.")
+        return True
     
     if not in_venv:
-        print("Creating virtual environment...")
-        venv_path = "venv"
-        
-        # Create virtual environment
-        success, output = run_command(f"{sys.executable} -m venv {venv_path}")
-        if not success:
-            print(f"Failed to create virtual environment: {output}")
-            print("Trying with --break-system-packages flag...")
-            success, output = run_command(f"{sys.executable} -m pip install -r requirements.txt --break-system-packages")
-            if success:
-                print("✅ Dependencies installed successfully!")
-                return True
-            else:
-                print(f"❌ Failed to install dependencies: {output}")
-                return False
+        venv_path = VENV_PATH
         
         # Use virtual environment python and pip
         if os.name == 'nt':  # Windows
@@ -49,18 +116,36 @@ def install_dependencies():
             python_exe = os.path.join(venv_path, "bin", "python")
             pip_exe = os.path.join(venv_path, "bin", "pip")
         
-        print(f"✅ Virtual environment created at: {venv_path}")
-        print("Installing dependencies in virtual environment...")
+        if os.path.isfile(pip_exe):
+            print(f"📁 Reusing existing virtual environment at: {venv_path}")
+        else:
+            print("Creating virtual environment...")
+            
+            # Create virtual environment
+            success, output = run_command([sys.executable, "-m", "venv", venv_path])
+            if not success:
+                print(f"Failed to create virtual environment: {output}")
+                print("Trying with --break-system-packages flag...")
+                success, output = run_command([sys.executable, "-m", "pip", "install", "-r", "requirements.txt", "--break-system-packages"])
+                if success:
+                    print("✅ Dependencies installed successfully!")
+                    return True
+                else:
+                    print(f"❌ Failed to install dependencies: {output}")
+                    return False
+            
+            print(f"✅ Virtual environment created at: {venv_path}")
         
-        # Upgrade pip in venv
-        success, output = run_command(f"{pip_exe} install --upgrade pip")
-        if not success:
-            print(f"Warning: Failed to upgrade pip in venv: {output}")
+        print("Installing dependencies in virtual environment...")
         
-        # Install requirements in venv
-        success, output = run_command(f"{pip_exe} install -r requirements.txt")
+        # Upgrade pip/wheel/setuptools and install requirements in a single pip run,
+        # reusing previously built wheels from the local cache
+        success, output = run_command([pip_exe, "install", "--cache-dir", PIP_CACHE_DIR,
+                                       "--upgrade", "pip", "wheel", "setuptools",
+                                       "-r", "requirements.txt"])
         if success:
             print("✅ Dependencies installed successfully in virtual environment!")
+            mark_requirements_installed(env_path, req_hash)
             
             # Create activation script
             create_venv_activation_script(venv_path)
@@ -70,15 +155,13 @@ def install_dependencies():
             return False
     else:
         # We're already in a virtual environment
-        # Upgrade pip first
-        success, output = run_command(f"{sys.executable} -m pip install --upgrade pip")
-        if not success:
-            print(f"Warning: Failed to upgrade pip: {output}")
-        
-        # Install requirements
-        success, output = run_command(f"{sys.executable} -m pip install -r requirements.txt")
+        # Upgrade pip/wheel/setuptools and install requirements in a single pip run
+        success, output = run_command([sys.executable, "-m", "pip", "install", "--cache-dir", PIP_CACHE_DIR,
+                                       "--upgrade", "pip", "wheel", "setuptools",
+                                       "-r", "requirements.txt"])
         if success:
             print("✅ Dependencies installed successfully!")
+            mark_requirements_installed(env_path, req_hash)
             return True
         else:
             print(f"❌ Failed to install dependencies: {output}")
@@ -97,27 +180,17 @@ def create_directories():
 
 def create_service_file():
     """Create a systemd service file for running the bot in background."""
-    service_content = f"""[Unit]
-Description=WhatsApp Automation Bot
-After=network.target
-
-[Service]
-Type=simple
-User={os.getenv('USER', 'ubuntu')}
-WorkingDirectory={os.getcwd()}
-ExecStart={sys.executable} {os.path.join(os.getcwd(), 'whatsapp_automation.py')} run
-Restart=always
-RestartSec=10
-Environment=DISPLAY=:0
-Environment=PYTHONPATH={os.getcwd()}
-
-[Install]
-WantedBy=multi-user.target
-"""
+    cwd = os.getcwd()
+    ctx = {
+        "user": os.getenv("USER", "ubuntu"),
+        "cwd": cwd,
+        "python": sys.executable,
+        "script": os.path.join(cwd, "whatsapp_automation.py"),
+    }
+    service_content = SERVICE_TEMPLATE.format_map(ctx)
     
     service_file = "whatsapp-bot.service"
-    with open(service_file, 'w') as f:
-        f.write(service_content)
+    write_file(service_file, service_content)
     
     print(f"✅ Created service file: {service_file}")
     print(f"To install as system service, run:")
@@ -132,29 +205,12 @@ def create_venv_activation_script(venv_path):
     else:  # Unix/Linux/macOS
         python_exe = os.path.join(venv_path, "bin", "python")
     
-    activation_script = f"""#!/bin/bash
-# WhatsApp Bot Virtual Environment Activation
-# Source this file to activate the virtual environment
-
-# Activate virtual environment
-source {venv_path}/bin/activate
-
-echo "Virtual environment activated!"
-echo "Python executable: {python_exe}"
-echo ""
-echo "You can now run:"
-echo "  python whatsapp_automation.py run"
-echo "  python whatsapp_automation.py test +1234567890"
-echo ""
-echo "Or use the launcher script:"
-echo "  ./start_bot.sh run"
-"""
+    activation_script = ACTIVATION_TEMPLATE.format_map({"venv_path": venv_path, "python": python_exe})
     
-    with open("activate_venv.sh", "w") as f:
-        f.write(activation_script)
+    write_file("activate_venv.sh", activation_script)
     
     # Make it executable
-    run_command("chmod +x activate_venv.sh")
+    os.chmod("activate_venv.sh", 0o755)
     print("✅ Created virtual environment activation script: activate_venv.sh")
 
 def setup_sample_images():
@@ -182,8 +238,7 @@ Note: Make sure your images are not too large (< 16MB) for WhatsApp compatibilit
 """
     
     readme_path = os.path.join(images_dir, "README.md")
-    with open(readme_path, 'w') as f:
-        f.write(readme_content)
+    write_file(readme_path, readme_content)
     
     print(f"✅ Created images directory with instructions")
 
@@ -200,11 +255,10 @@ def main():
         print("❌ Setup failed due to dependency installation errors.")
         sys.exit(1)
     
-    # Setup sample images directory
-    setup_sample_images()
-    
-    # Create service file
-    create_service_file()
+    # Setup sample images directory and create service file; they touch
+    # independent paths so run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(lambda step: step(), [setup_sample_images, create_service_file]))
     
     print("=" * 50)
     print("✅ Setup completed successfully!")
@@ -214,7 +268,7 @@ def main():
     print("3. Test the bot with: python whatsapp_automation.py test +1234567890")
     print("4. Run the bot with: python whatsapp_automation.py run")
     print("5. For background service, follow the systemd instructions above")
-    print("\n⚠️  Important: Make sure WhatsApp Web is logged in on your default browser!")
+    print("\n⚠️  Important: Scan the WhatsApp Web QR code in the Chrome window the bot opens on its first run!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,55 +5,187 @@ Sends scheduled messages to groups and personal contacts
 Supports text messages, images with/without captions
 """
 
-import pywhatkit as kit
-import schedule
 import time
+import heapq
+import itertools
 import yaml
 import logging
+import logging.handlers
+import queue
+import selectors
+import signal
+import socket
 import os
 import sys
+import pickle
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from dotenv import load_dotenv
-from PIL import Image
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+# Prefer libyaml's C implementation when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
+WHATSAPP_WEB_URL = "https://web.whatsapp.com"
+
+# CSS selectors for the WhatsApp Web elements the bot interacts with
+SELECTOR_CHAT_LIST = "#pane-side"
+SELECTOR_COMPOSE_BOX = "footer div[contenteditable='true']"
+SELECTOR_ATTACH_BUTTON = "span[data-icon='plus'], span[data-icon='plus-rounded'], span[data-icon='clip']"
+SELECTOR_IMAGE_INPUT = "input[type='file'][accept*='image']"
+SELECTOR_SEND_BUTTON = "span[data-icon='send'], span[data-icon='wds-ic-send-filled']"
+SELECTOR_MESSAGE_ROW = "#main div[role='row']"
+# Outgoing message ids start with 'true_' (sent by me)
+SELECTOR_OUTGOING_MESSAGE = "#main div[data-id^='true_']"
+SELECTOR_SENT_ICON = "span[data-icon='msg-check'], span[data-icon='msg-dblcheck'], span[data-icon='msg-dblcheck-ack']"
+
+# Shared default for missing contact/message lists, avoids allocating a new list per lookup
+_EMPTY: Tuple[Any, ...] = ()
+
+# Default longest single wait in the scheduler loop before re-checking the wall clock
+DEFAULT_MAX_SLEEP = 15 * 60
+
+# Requests written to the scheduler's wakeup socket
+WAKEUP_RELOAD = b'h'
+WAKEUP_STOP = b't'
+
+# Bump when the shape of the pickled config cache changes
+CONFIG_CACHE_VERSION = 1
+
+# Characters stripped from phone numbers in a single pass
+_PHONE_STRIP = str.maketrans('', '', ' -()')
+
+logger = logging.getLogger(__name__)
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Configure logging: records are queued by the caller and written by a background listener.
+    
+    Returns the started listener; stop it before exiting to flush queued records.
+    """
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [
         logging.FileHandler('whatsapp_bot.log'),
         logging.StreamHandler(sys.stdout)
     ]
-)
-logger = logging.getLogger(__name__)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    logging.root.addHandler(logging.handlers.QueueHandler(log_queue))
+    logging.root.setLevel(logging.INFO)
+    listener.start()
+    return listener
 
 class WhatsAppBot:
-    def __init__(self, config_file: str = "config.yaml"):
-        """Initialize the WhatsApp automation bot."""
+    def __init__(self, config_file: str = "config.yaml", one_off: bool = False):
+        """Initialize the WhatsApp automation bot.
+        
+        one_off bots (e.g. the test command) use a separate browser profile so they
+        can run while the scheduler holds the main profile.
+        """
+        from dotenv import load_dotenv
+        
+        # Load environment variables
+        load_dotenv()
+        
         self.config_file = config_file
+        self.one_off = one_off
         self.config = self.load_config()
+        self.apply_settings()
+        
+        # Browser session shared by all sends, started on first use
+        self._driver = None
+        
+        # Heap of (run_at, job_id, contact, message, is_group) ordered by next run time
         self.scheduled_jobs = []
+        self._job_ids = itertools.count()
+        
+        # Self-pipe used by signal handlers to wake the scheduler out of its sleep
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._wakeup_r, selectors.EVENT_READ)
+        
         logger.info("WhatsApp Bot initialized successfully")
     
+    def apply_settings(self):
+        """Resolve settings once instead of on every send."""
+        settings = (self.config or {}).get('settings', {})
+        self.wait_time = settings.get('wait_time', 20)
+        if self.one_off:
+            self.browser_profile = settings.get('oneoff_browser_profile', 'whatsapp_profile_oneoff')
+        else:
+            self.browser_profile = settings.get('browser_profile', 'whatsapp_profile')
+        self.login_timeout = settings.get('login_timeout', 120)
+        self.max_sleep = settings.get('max_sleep', DEFAULT_MAX_SLEEP)
+        self.image_formats = frozenset(
+            fmt.lower() for fmt in settings.get('image_formats', ['.jpg', '.jpeg', '.png', '.gif'])
+        )
+    
+    def reload_config(self):
+        """Reload the configuration file and rebuild the schedule."""
+        logger.info("Reloading configuration from %s", self.config_file)
+        self.config = self.load_config()
+        self.apply_settings()
+        self.schedule_messages()
+    
     def load_config(self) -> Dict:
-        """Load configuration from YAML file."""
+        """Load configuration from YAML file, using a pickled copy when it is up to date."""
+        cache_file = self.config_file + '.pkl'
         try:
+            stat = os.stat(self.config_file)
+            cache_key = (CONFIG_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+            
+            try:
+                with open(cache_file, 'rb') as file:
+                    cached_key, config = pickle.load(file)
+                if cached_key == cache_key:
+                    logger.info("Configuration loaded from cache %s", cache_file)
+                    return config
+            except Exception:
+                # Missing, stale or foreign cache: fall back to parsing the YAML
+                pass
+            
             with open(self.config_file, 'r', encoding='utf-8') as file:
-                config = yaml.safe_load(file)
-                logger.info(f"Configuration loaded from {self.config_file}")
-                return config
+                config = yaml.load(file, Loader=SafeLoader)
+                logger.info("Configuration loaded from %s", self.config_file)
+            
+            self.parse_message_times(config)
+            
+            try:
+                with open(cache_file, 'wb') as file:
+                    pickle.dump((cache_key, config), file, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError as e:
+                logger.warning("Could not write configuration cache %s: %s", cache_file, e)
+            
+            return config
         except FileNotFoundError:
-            logger.error(f"Configuration file {self.config_file} not found")
+            logger.error("Configuration file %s not found", self.config_file)
             self.create_sample_config()
             return {}
         except yaml.YAMLError as e:
-            logger.error(f"Error parsing YAML configuration: {e}")
+            logger.error("Error parsing YAML configuration: %s", e)
             return {}
     
+    def parse_message_times(self, config: Optional[Dict]):
+        """Pre-parse each message's HH:MM time into an (hour, minute) tuple stored as '_hm'."""
+        contacts = (config or {}).get('contacts') or {}
+        for contact in itertools.chain(contacts.get('personal', _EMPTY), contacts.get('groups', _EMPTY)):
+            for message in contact.get('messages', _EMPTY):
+                time_str = message.get('time')
+                if not time_str:
+                    continue
+                try:
+                    hour, minute = map(int, str(time_str).split(':', 1))
+                except ValueError:
+                    continue
+                if 0 <= hour < 24 and 0 <= minute < 60:
+                    message['_hm'] = (hour, minute)
+    
     def create_sample_config(self):
         """Create a sample configuration file."""
         sample_config = {
@@ -74,6 +206,7 @@ class WhatsAppBot:
                 'groups': [
                     {
                         'name': 'Family Group',
+                        'invite_code': 'YOUR_GROUP_INVITE_CODE',  # from https://chat.whatsapp.com/<code>
                         'messages': [
                             {
                                 'type': 'text',
@@ -91,120 +224,240 @@ class WhatsAppBot:
                 ]
             },
             'settings': {
-                'wait_time': 20,  # seconds to wait after opening WhatsApp
-                'close_tab': True,  # close tab after sending message
+                'wait_time': 20,  # seconds to wait for WhatsApp Web elements
+                'browser_profile': 'whatsapp_profile',  # keeps WhatsApp Web logged in
+                'oneoff_browser_profile': 'whatsapp_profile_oneoff',  # used by the test command
+                'login_timeout': 120,  # seconds to wait for the QR code login
+                'max_sleep': 900,  # max seconds between clock checks; bounds lateness after suspend
                 'image_formats': ['.jpg', '.jpeg', '.png', '.gif'],
                 'timezone': 'local'
             }
         }
         
-        with open(self.config_file, 'w', encoding='utf-8') as file:
-            yaml.dump(sample_config, file, default_flow_style=False, allow_unicode=True)
+        # Write through a temporary file so an interrupted write never leaves a partial config
+        tmp_file = self.config_file + '.tmp'
+        Path(tmp_file).write_text(
+            yaml.dump(sample_config, Dumper=SafeDumper, default_flow_style=False, allow_unicode=True),
+            encoding='utf-8'
+        )
+        os.replace(tmp_file, self.config_file)
         
-        logger.info(f"Sample configuration created at {self.config_file}")
+        logger.info("Sample configuration created at %s", self.config_file)
         print(f"Please edit {self.config_file} with your contacts and messages")
     
     def validate_phone_number(self, phone: str) -> str:
         """Validate and format phone number."""
         # Remove spaces and special characters except +
-        phone = phone.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
+        phone = phone.translate(_PHONE_STRIP)
         
         # Ensure phone starts with country code
         if not phone.startswith('+'):
-            logger.warning(f"Phone number {phone} doesn't start with country code (+)")
+            logger.warning("Phone number %s doesn't start with country code (+)", phone)
             return phone
         
         return phone
     
     def validate_image_path(self, image_path: str) -> bool:
         """Validate if image file exists and is in supported format."""
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
+        try:
+            os.stat(image_path)
+        except FileNotFoundError:
+            logger.error("Image file not found: %s", image_path)
+            return False
+        except OSError as e:
+            logger.error("Cannot access image file %s: %s", image_path, e)
             return False
         
-        supported_formats = self.config.get('settings', {}).get('image_formats', ['.jpg', '.jpeg', '.png', '.gif'])
         file_extension = os.path.splitext(image_path)[1].lower()
         
-        if file_extension not in supported_formats:
-            logger.error(f"Unsupported image format: {file_extension}")
+        if file_extension not in self.image_formats:
+            logger.error("Unsupported image format: %s", file_extension)
             return False
         
         return True
     
+    def get_driver(self):
+        """Return the shared WhatsApp Web browser session, starting it on first use."""
+        from selenium import webdriver
+        from selenium.common.exceptions import WebDriverException
+        
+        if self._driver is not None:
+            try:
+                self._driver.current_url
+                return self._driver
+            except WebDriverException:
+                logger.warning("Browser session lost. Starting a new one.")
+                self._driver = None
+        
+        options = webdriver.ChromeOptions()
+        # A persistent profile keeps WhatsApp Web logged in across restarts
+        profile_dir = os.path.abspath(self.browser_profile)
+        options.add_argument(f"--user-data-dir={profile_dir}")
+        try:
+            driver = webdriver.Chrome(options=options)
+        except WebDriverException as e:
+            # Chrome locks its profile directory, so only one process can use it at a time
+            raise RuntimeError(
+                f"Could not start Chrome with profile {profile_dir}; it may already be in use "
+                f"by another bot process: {e.msg}"
+            ) from e
+        try:
+            driver.get(WHATSAPP_WEB_URL)
+            logger.info("Waiting for WhatsApp Web login (scan the QR code if prompted)...")
+            self.wait_for(SELECTOR_CHAT_LIST, timeout=self.login_timeout, driver=driver)
+        except Exception:
+            driver.quit()
+            raise
+        
+        self._driver = driver
+        return driver
+    
+    def wait_for(self, selector: str, timeout: Optional[float] = None, driver=None, clickable: bool = True):
+        """Wait until the element matching a CSS selector is clickable and return it.
+        
+        Pass clickable=False for hidden elements such as file inputs, which only need to be present.
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        condition = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
+        return WebDriverWait(driver or self._driver, timeout or self.wait_time).until(
+            condition((By.CSS_SELECTOR, selector))
+        )
+    
+    def outgoing_message_ids(self) -> set:
+        """Wait for the open chat's history to render and return its outgoing messages' data-ids.
+        
+        Every chat shows at least the encryption notice row, so an empty chat still counts as loaded.
+        """
+        from selenium.webdriver.common.by import By
+        
+        self.wait_for(SELECTOR_MESSAGE_ROW, clickable=False)
+        return {
+            message.get_attribute('data-id')
+            for message in self._driver.find_elements(By.CSS_SELECTOR, SELECTOR_OUTGOING_MESSAGE)
+        }
+    
+    def wait_until_sent(self, previous_ids: set):
+        """Wait until outgoing messages not in previous_ids appear and all show a sent tick.
+        
+        Only the new messages' own status is checked, so older messages stuck pending don't matter.
+        """
+        from selenium.common.exceptions import StaleElementReferenceException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        def new_message_sent(driver):
+            new_messages = [
+                message for message in driver.find_elements(By.CSS_SELECTOR, SELECTOR_OUTGOING_MESSAGE)
+                if message.get_attribute('data-id') not in previous_ids
+            ]
+            return bool(new_messages) and all(
+                message.find_elements(By.CSS_SELECTOR, SELECTOR_SENT_ICON) for message in new_messages
+            )
+        
+        WebDriverWait(self._driver, self.wait_time,
+                      ignored_exceptions=(StaleElementReferenceException,)).until(new_message_sent)
+    
+    def insert_text(self, element, text: str):
+        """Insert text into a WhatsApp Web input; unlike send_keys this handles emoji."""
+        element.click()
+        self._driver.execute_script(
+            "arguments[0].focus(); document.execCommand('insertText', false, arguments[1]);",
+            element, text
+        )
+    
+    def close(self):
+        """Shut down the browser session if one was started and release the wakeup socket."""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception as e:
+                logger.warning("Error closing browser session: %s", e)
+            self._driver = None
+        
+        if self._sel is not None:
+            self._sel.unregister(self._wakeup_r)
+            self._sel.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+            self._sel = None
+    
     def send_text_message(self, phone: str, message: str, contact_name: str = "Unknown"):
-        """Send a text message to a phone number."""
+        """Send a text message to a phone number (already normalized by validate_phone_number)."""
+        from selenium.webdriver.common.keys import Keys
+        
         try:
-            phone = self.validate_phone_number(phone)
-            wait_time = self.config.get('settings', {}).get('wait_time', 20)
-            close_tab = self.config.get('settings', {}).get('close_tab', True)
+            logger.info("Sending text message to %s (%s)", contact_name, phone)
             
-            logger.info(f"Sending text message to {contact_name} ({phone})")
+            driver = self.get_driver()
+            driver.get(f"{WHATSAPP_WEB_URL}/send?phone={phone.lstrip('+')}")
+            compose_box = self.wait_for(SELECTOR_COMPOSE_BOX)
+            previous_ids = self.outgoing_message_ids()
+            self.insert_text(compose_box, message)
+            compose_box.send_keys(Keys.ENTER)
+            self.wait_until_sent(previous_ids)
             
-            # Send message immediately
-            kit.sendwhatmsg_instantly(
-                phone_no=phone,
-                message=message,
-                wait_time=wait_time,
-                tab_close=close_tab
-            )
-            
-            logger.info(f"Text message sent successfully to {contact_name}")
+            logger.info("Text message sent successfully to %s", contact_name)
             
         except Exception as e:
-            logger.error(f"Failed to send text message to {contact_name}: {str(e)}")
+            logger.error("Failed to send text message to %s: %s", contact_name, e)
     
-    def send_image_message(self, phone: str, image_path: str, caption: str = "", contact_name: str = "Unknown"):
-        """Send an image message to a phone number."""
+    def send_image_message(self, phone: str, image_path: str, caption: str = "", contact_name: str = "Unknown",
+                           validated: bool = False):
+        """Send an image message to a phone number (already normalized by validate_phone_number).
+        
+        Pass validated=True when image_path was already checked with validate_image_path.
+        """
         try:
-            if not self.validate_image_path(image_path):
+            if not validated and not self.validate_image_path(image_path):
                 return
             
-            phone = self.validate_phone_number(phone)
-            wait_time = self.config.get('settings', {}).get('wait_time', 20)
-            close_tab = self.config.get('settings', {}).get('close_tab', True)
+            logger.info("Sending image to %s (%s)", contact_name, phone)
             
-            logger.info(f"Sending image to {contact_name} ({phone})")
+            driver = self.get_driver()
+            driver.get(f"{WHATSAPP_WEB_URL}/send?phone={phone.lstrip('+')}")
+            attach_button = self.wait_for(SELECTOR_ATTACH_BUTTON)
+            previous_ids = self.outgoing_message_ids()
+            attach_button.click()
+            # The file input is hidden and only rendered once the attach menu opens
+            self.wait_for(SELECTOR_IMAGE_INPUT, clickable=False).send_keys(os.path.abspath(image_path))
             
+            # The caption box has focus once the media preview opens
+            send_button = self.wait_for(SELECTOR_SEND_BUTTON)
             if caption:
-                kit.sendwhats_image(
-                    receiver=phone,
-                    img_path=image_path,
-                    caption=caption,
-                    wait_time=wait_time,
-                    tab_close=close_tab
-                )
-                logger.info(f"Image with caption sent successfully to {contact_name}")
-            else:
-                kit.sendwhats_image(
-                    receiver=phone,
-                    img_path=image_path,
-                    wait_time=wait_time,
-                    tab_close=close_tab
-                )
-                logger.info(f"Image sent successfully to {contact_name}")
-                
+                self.insert_text(driver.switch_to.active_element, caption)
+            send_button.click()
+            self.wait_until_sent(previous_ids)
+            
+            logger.info("Image %ssent successfully to %s", "with caption " if caption else "", contact_name)
+            
         except Exception as e:
-            logger.error(f"Failed to send image to {contact_name}: {str(e)}")
+            logger.error("Failed to send image to %s: %s", contact_name, e)
     
-    def send_group_message(self, group_name: str, message: str):
-        """Send a text message to a WhatsApp group."""
+    def send_group_message(self, invite_code: str, message: str, group_name: str = "Unknown Group"):
+        """Send a text message to a WhatsApp group, identified by its invite code.
+        
+        The invite code is the last part of the group's https://chat.whatsapp.com/<code> link.
+        """
+        from selenium.webdriver.common.keys import Keys
+        
         try:
-            wait_time = self.config.get('settings', {}).get('wait_time', 20)
-            close_tab = self.config.get('settings', {}).get('close_tab', True)
-            
-            logger.info(f"Sending text message to group: {group_name}")
+            logger.info("Sending text message to group: %s", group_name)
             
-            kit.sendwhatmsg_to_group_instantly(
-                group_id=group_name,
-                message=message,
-                wait_time=wait_time,
-                tab_close=close_tab
-            )
+            driver = self.get_driver()
+            driver.get(f"{WHATSAPP_WEB_URL}/accept?code={invite_code}")
+            compose_box = self.wait_for(SELECTOR_COMPOSE_BOX)
+            previous_ids = self.outgoing_message_ids()
+            self.insert_text(compose_box, message)
+            compose_box.send_keys(Keys.ENTER)
+            self.wait_until_sent(previous_ids)
             
-            logger.info(f"Text message sent successfully to group: {group_name}")
+            logger.info("Text message sent successfully to group: %s", group_name)
             
         except Exception as e:
-            logger.error(f"Failed to send message to group {group_name}: {str(e)}")
+            logger.error("Failed to send message to group %s: %s", group_name, e)
     
     def process_message(self, contact_info: Dict, message_info: Dict, is_group: bool = False):
         """Process and send a single message."""
@@ -212,16 +465,21 @@ class WhatsAppBot:
             message_type = message_info.get('type', 'text')
             
             if is_group:
-                contact_identifier = contact_info.get('name', 'Unknown Group')
+                group_name = contact_info.get('name', 'Unknown Group')
+                # Older configs put the invite code in 'name'
+                invite_code = contact_info.get('invite_code', group_name)
                 if message_type == 'text':
                     content = message_info.get('content', '')
-                    self.send_group_message(contact_identifier, content)
+                    self.send_group_message(invite_code, content, group_name)
                 elif message_type == 'image':
                     # For groups, we'll use individual phone numbers if available
                     # or log that group image sending is limited
-                    logger.warning(f"Image sending to groups is limited. Consider sending to individual members.")
+                    logger.warning("Image sending to groups is limited. Consider sending to individual members.")
             else:
-                phone = contact_info.get('phone', '')
+                # Use the number normalized at scheduling time when available
+                phone = contact_info.get('_phone')
+                if phone is None:
+                    phone = self.validate_phone_number(contact_info.get('phone', ''))
                 contact_name = contact_info.get('name', 'Unknown')
                 
                 if message_type == 'text':
@@ -230,10 +488,35 @@ class WhatsAppBot:
                 elif message_type == 'image':
                     image_path = message_info.get('image_path', '')
                     caption = message_info.get('caption', '')
-                    self.send_image_message(phone, image_path, caption, contact_name)
+                    self.send_image_message(phone, image_path, caption, contact_name,
+                                            validated=message_info.get('_validated', False))
                     
         except Exception as e:
-            logger.error(f"Error processing message: {str(e)}")
+            logger.error("Error processing message: %s", e)
+    
+    def next_run_time(self, hour: int, minute: int) -> float:
+        """Return the epoch timestamp of the next daily occurrence of hour:minute."""
+        now = datetime.now()
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return run_at.timestamp()
+    
+    def add_job(self, run_at: float, contact: Dict, message: Dict, is_group: bool):
+        """Push a message job onto the scheduler heap."""
+        heapq.heappush(self.scheduled_jobs, (run_at, next(self._job_ids), contact, message, is_group))
+    
+    def check_message_image(self, message: Dict, target: str) -> bool:
+        """Validate an image message's file up front and mark it so sends skip re-validation."""
+        if message.get('type', 'text') != 'image':
+            return True
+        
+        if not self.validate_image_path(message.get('image_path', '')):
+            logger.error("Not scheduling image message for %s at %s", target, message.get('time'))
+            return False
+        
+        message['_validated'] = True
+        return True
     
     def schedule_messages(self):
         """Schedule all messages based on configuration."""
@@ -241,31 +524,41 @@ class WhatsAppBot:
             logger.error("No configuration loaded. Cannot schedule messages.")
             return
         
+        self.scheduled_jobs.clear()
         contacts = self.config.get('contacts', {})
+        log_info = logger.info
         
         # Schedule personal contact messages
-        personal_contacts = contacts.get('personal', [])
+        personal_contacts = contacts.get('personal', _EMPTY)
         for contact in personal_contacts:
-            messages = contact.get('messages', [])
+            # Normalize the phone number once instead of on every send
+            contact['_phone'] = self.validate_phone_number(contact.get('phone', ''))
+            messages = contact.get('messages', _EMPTY)
             for message in messages:
                 time_str = message.get('time', '')
                 if time_str:
-                    schedule.every().day.at(time_str).do(
-                        self.process_message, contact, message, False
-                    )
-                    logger.info(f"Scheduled message for {contact.get('name', 'Unknown')} at {time_str}")
+                    if '_hm' not in message:
+                        logger.error("Invalid time %r for %s, expected HH:MM", time_str, contact.get('name', 'Unknown'))
+                        continue
+                    if not self.check_message_image(message, contact.get('name', 'Unknown')):
+                        continue
+                    self.add_job(self.next_run_time(*message['_hm']), contact, message, False)
+                    log_info("Scheduled message for %s at %s", contact.get('name', 'Unknown'), time_str)
         
         # Schedule group messages
-        groups = contacts.get('groups', [])
+        groups = contacts.get('groups', _EMPTY)
         for group in groups:
-            messages = group.get('messages', [])
+            messages = group.get('messages', _EMPTY)
             for message in messages:
                 time_str = message.get('time', '')
                 if time_str:
-                    schedule.every().day.at(time_str).do(
-                        self.process_message, group, message, True
-                    )
-                    logger.info(f"Scheduled message for group {group.get('name', 'Unknown')} at {time_str}")
+                    if '_hm' not in message:
+                        logger.error("Invalid time %r for group %s, expected HH:MM", time_str, group.get('name', 'Unknown'))
+                        continue
+                    if not self.check_message_image(message, f"group {group.get('name', 'Unknown')}"):
+                        continue
+                    self.add_job(self.next_run_time(*message['_hm']), group, message, True)
+                    log_info("Scheduled message for group %s at %s", group.get('name', 'Unknown'), time_str)
     
     def run_scheduler(self):
         """Run the message scheduler."""
@@ -280,34 +573,99 @@ class WhatsAppBot:
         logger.info("All messages scheduled successfully")
         print("WhatsApp Bot is running... Press Ctrl+C to stop")
         
+        # SIGHUP reloads the configuration, SIGTERM stops the scheduler cleanly
+        previous_handlers = {}
+        can_reload = hasattr(signal, 'SIGHUP')
+        if can_reload:
+            previous_handlers[signal.SIGHUP] = signal.signal(signal.SIGHUP, lambda signum, frame: self.wakeup(WAKEUP_RELOAD))
+        previous_handlers[signal.SIGTERM] = signal.signal(signal.SIGTERM, lambda signum, frame: self.wakeup(WAKEUP_STOP))
+        
+        jobs = self.scheduled_jobs
         try:
             while True:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                if not jobs:
+                    if not can_reload:
+                        logger.warning("No scheduled jobs. Stopping scheduler.")
+                        break
+                    logger.warning("No scheduled jobs. Waiting for a configuration reload (SIGHUP).")
+                
+                # Sleep in the kernel until the earliest job is due or a signal arrives.
+                # The timeout runs on the monotonic clock, which stops during suspend and
+                # ignores wall-clock steps, so it is capped at max_sleep: after a resume or
+                # clock change a job fires at most max_sleep seconds late. Between jobs the
+                # loop wakes at most once per max_sleep (96 times a day at the 15 min default).
+                timeout = max(0.0, min(jobs[0][0] - time.time(), self.max_sleep)) if jobs else None
+                if self._sel.select(timeout):
+                    requests = self._wakeup_r.recv(64)
+                    if WAKEUP_STOP in requests:
+                        logger.info("WhatsApp Bot stopped by SIGTERM")
+                        break
+                    if WAKEUP_RELOAD in requests:
+                        self.reload_config()
+                    continue
+                
+                if not jobs or jobs[0][0] > time.time():
+                    continue
+                
+                run_at, job_id, contact, message, is_group = heapq.heappop(jobs)
+                self.process_message(contact, message, is_group)
+                
+                # Messages repeat daily at the same local time; computing the next
+                # occurrence from now also skips any missed while sending
+                run_at = self.next_run_time(*message['_hm'])
+                heapq.heappush(jobs, (run_at, job_id, contact, message, is_group))
         except KeyboardInterrupt:
             logger.info("WhatsApp Bot stopped by user")
             print("\nWhatsApp Bot stopped.")
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            self.close()
+    
+    def wakeup(self, request: bytes):
+        """Wake the scheduler loop with a request; safe to call from a signal handler."""
+        try:
+            self._wakeup_w.send(request)
+        except OSError:
+            # Buffer full: the loop already has pending wakeups to process
+            pass
     
     def send_test_message(self, phone: str, message: str = "Test message from WhatsApp Bot"):
         """Send a test message to verify setup."""
         logger.info("Sending test message...")
-        self.send_text_message(phone, message, "Test Contact")
+        self.send_text_message(self.validate_phone_number(phone), message, "Test Contact")
     
     def list_scheduled_jobs(self):
         """List all scheduled jobs."""
-        jobs = schedule.jobs
+        if not self.scheduled_jobs:
+            self.schedule_messages()
+        
+        jobs = sorted(self.scheduled_jobs)
         if not jobs:
             print("No jobs scheduled.")
             return
         
         print("Scheduled Jobs:")
-        for i, job in enumerate(jobs, 1):
-            print(f"{i}. {job}")
+        for i, (run_at, _, contact, message, is_group) in enumerate(jobs, 1):
+            target = f"group {contact.get('name', 'Unknown')}" if is_group else contact.get('name', 'Unknown')
+            print(f"{i}. {datetime.fromtimestamp(run_at):%Y-%m-%d %H:%M} - {message.get('type', 'text')} message to {target}")
 
 def main():
     """Main function to run the WhatsApp bot."""
-    bot = WhatsAppBot()
-    
+    log_listener = setup_logging()
+    bot = None
+    try:
+        one_off = len(sys.argv) > 1 and sys.argv[1] == "test"
+        bot = WhatsAppBot(one_off=one_off)
+        run_cli(bot)
+    finally:
+        if bot is not None:
+            bot.close()
+        # Flush queued log records before exiting
+        log_listener.stop()
+
+def run_cli(bot: WhatsAppBot):
+    """Dispatch the command line arguments to the bot."""
     if len(sys.argv) > 1:
         command = sys.argv[1]
         